@@ -1,6 +1,4 @@
 import os
-import sys
-import inspect
 import json
 import logging
 import os.path as osp
@@ -24,6 +22,7 @@ from utils import prepare_data, import_registry
 
 
 _FLAG_FIRST = object()
+DATASET_KEYS = ('dataset_train', 'dataset_val', 'dataset_test')
 NAME_2_TASK = {
     'detection': 'FashionDetector',
     'classification': ['model', 'MODELS']
@@ -41,19 +40,29 @@ def flattenDict(d, parent_key='', sep='_'):
     return dict(items)
 
 
-"""
-Build a dictionary of optimizer classes available in PyTorch's 'optim' module.
+def _get_optimizers() -> dict:
+    """
+    Build a dictionary of optimizer classes available in PyTorch's 'optim' module.
+
+    The dictionary's keys are strings that correspond to the names of the optimizer classes, and the values are the
+    optimizer classes themselves. The dictionary is built on first use and cached as the module-level `OPTIMIZERS`.
+
+    Returns:
+        dict: A dictionary mapping optimizer class names to their corresponding classes.
+    """
+    global OPTIMIZERS
+    optimizers = globals().get('OPTIMIZERS')
+    if optimizers is None:
+        optimizers = {name: obj for name, obj in vars(optim).items()
+                      if isinstance(obj, type) and issubclass(obj, optim.Optimizer)}
+        OPTIMIZERS = optimizers
+    return optimizers
 
-The dictionary's keys are strings that correspond to the names of the optimizer classes, and the values are the
-optimizer classes themselves.
 
-Returns:
-    dict: A dictionary mapping optimizer class names to their corresponding classes.
-"""
-OPTIMIZERS = dict()
-for member, obj in inspect.getmembers(sys.modules['torch.optim']):
-    if inspect.isclass(obj):
-        OPTIMIZERS[member] = obj
+def __getattr__(name):
+    if name == 'OPTIMIZERS':
+        return _get_optimizers()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def build_model(cfg) -> nn.Module:
@@ -84,8 +93,8 @@ def build_model(cfg) -> nn.Module:
     model_cfg = model_cfg['cfg']
     model_type = cfg['model']['name']
 
-    logging.debug(
-        f'The task is {task} and the requested model is {model_type}.')
+    logging.debug('The task is %s and the requested model is %s.',
+                  task, model_type)
     module_name = NAME_2_TASK[task]
     # registry = import_registry(
     #     module_name=module_name, registry_name=registry_name)
@@ -95,6 +104,9 @@ def build_model(cfg) -> nn.Module:
     #     raise ValueError(f'Unsupported model type: `{model_type}`. '
     #                      f'Must be one of \n{list(MODELS.registry.keys())}')
     # module = registry.registry[model_type](**model_cfg)
+    if not isinstance(module_name, str) or module_name not in MODELS:
+        raise ValueError(f'Task `{task}` maps to `{module_name}` in NAME_2_TASK, '
+                         f'which is not a registered model. Must be one of \n{list(MODELS.registry)}')
     model = MODELS[module_name](**cfg['model'])
     return model
 
@@ -121,20 +133,20 @@ def build_dataset(data: dict) -> torch.utils.data.Dataset:
     print(dataset)
     ```
     """
-    # Find all the dataset related keys
-    dataset_keys = list(filter(lambda x: 'dataset' in x, data.keys()))
+    # Find all the dataset related keys, train split first
+    dataset_keys = [key for key in DATASET_KEYS if key in data]
     ret = dict()
     logging.info(f'Building datasets.')
-    logging.debug(f'Dataset keys: {", ".join(k for k in dataset_keys)}')
+    logging.debug('Dataset keys: %s', ', '.join(dataset_keys))
     for key in dataset_keys:
         logging.info(f'Building dataset based on `{key}` dataset')
         dataset_cfg = data[key]['cfg']
         dataset_type = data[key]['name']
-        logging.debug(f'Config:\n {dataset_cfg}')
+        logging.debug('Config:\n %s', dataset_cfg)
 
-        if dataset_type not in DATASETS.registry.keys():
+        if dataset_type not in DATASETS:
             raise ValueError(f'Unsupported model type: `{dataset_type}`. '
-                             f'Must be one of \n{list(DATASETS.registry.keys())}')
+                             f'Must be one of \n{list(DATASETS.registry)}')
         dataset_cfg['transforms'] = TRANSFORMS[dataset_cfg['transforms']['name']](
             **dataset_cfg['transforms']['cfg'])
         # if key == 'train_dataset':
@@ -189,30 +201,77 @@ def build_optimizer(cfg: dict,
     logging.info('Building optimizer.')
     optimizer_type = cfg['name']
     optimizer_cfg = cfg['cfg']
-    logging.debug(f'Config:\n{optimizer_cfg}')
+    logging.debug('Config:\n%s', optimizer_cfg)
     # logging.debug(f'Selected modules:\n{cfg["params"]}')
-    trainable_params = []
+    # Keyed on the parameters themselves so that overlapping modules (e.g. `cls_head` and
+    # `cls_head.cls`) do not hand the optimizer the same parameter twice.
+    trainable_params = dict()
     if cfg['params'] is not None:
-        for name, module in model.named_modules():
-            if name in cfg['params']:
-                logging.debug(f'Module: {module}')
-                optimizer_cfg['params'] = module.parameters()
+        name_to_module = dict(model.named_modules())
+        for name in dict.fromkeys(cfg['params']):
+            if name not in name_to_module:
+                raise ValueError(f'Unknown module: `{name}`. '
+                                 f'Must be one of \n{list(name_to_module)}')
+            module = name_to_module[name]
+            logging.debug('Module: %s', module)
+            trainable_params.update(dict.fromkeys(
+                p for p in module.parameters() if p.requires_grad))
+        optimizer_cfg['params'] = list(trainable_params)
     else:
         optimizer_cfg["params"] = model.params
-    if optimizer_type not in OPTIMIZERS.keys():
+    optimizers = _get_optimizers()
+    if optimizer_type not in optimizers:
         raise ValueError(f'Unsupported model type: `{optimizer_type}`. '
-                         f'Must be one of \n{list(OPTIMIZERS.keys())}')
+                         f'Must be one of \n{list(optimizers)}')
+
+    return optimizers[optimizer_type](**optimizer_cfg)
+
+
+def collate_tuples(batch):
+    """
+    Collate a batch of samples into a tuple of per-field tuples, e.g. `(images, targets)`.
+    """
+    return tuple(zip(*batch))
 
-    return OPTIMIZERS[optimizer_type](**optimizer_cfg)
+
+def build_dataloader(cfg: dict,
+                     dataset: torch.utils.data.Dataset,
+                     **kwargs) -> DataLoader:
+    """
+    Builds a PyTorch DataLoader for `dataset` from the configuration provided in the `cfg` dictionary.
+
+    Args:
+        cfg (dict): A dictionary containing the data loader configuration. Its "loader_cfg" entry is passed to the
+            `DataLoader` constructor. Unless set there, the loader uses 4 worker processes that persist across epochs,
+            each prefetching 4 batches, and, when CUDA is available, returns pinned memory so host-to-device copies can be
+            asynchronous.
+        dataset (torch.utils.data.Dataset): The dataset to load from.
+        **kwargs: Additional keyword arguments passed to the `DataLoader` constructor, e.g. `collate_fn`.
+
+    Returns:
+        DataLoader: The PyTorch DataLoader built according to the configuration.
+
+    Example:
+        >>> cfg = {"loader_cfg": {"batch_size": 2, "shuffle": True, "num_workers": 8}}
+        >>> loader = build_dataloader(cfg, dataset, collate_fn=collate_tuples)
+    """
+    loader_cfg = dict(cfg['loader_cfg'])
+    num_workers = loader_cfg.setdefault('num_workers', 4)
+    loader_cfg.setdefault('pin_memory', torch.cuda.is_available())
+    loader_cfg.setdefault('persistent_workers', num_workers > 0)
+    if num_workers > 0:
+        loader_cfg.setdefault('prefetch_factor', 4)
+    logging.debug('Loader configuration: %s', loader_cfg)
+    return DataLoader(dataset=dataset, **loader_cfg, **kwargs)
 
 
 def build_trainer(cfg_file) -> Trainer:
     data = read_file(cfg_file)
     flat_data = flattenDict(data)
-    logging.debug(f'Flattened data: {flat_data}')
+    logging.debug('Flattened data: %s', flat_data)
     model_cfg = data['model']
-    logging.debug(f'Model configuration: {model_cfg}')
-    logging.debug(f'Task: {data["task"]}')
+    logging.debug('Model configuration: %s', model_cfg)
+    logging.debug('Task: %s', data['task'])
     logging.info('Building model...')
     model = build_model(cfg=data)
     logging.info('Building datasets...')
@@ -220,27 +279,25 @@ def build_trainer(cfg_file) -> Trainer:
 
     logging.info('Creating optimizers.')
     optimizer_cfg = data['optimizer']
-    logging.debug(f'Optimizer configuration: {optimizer_cfg}')
+    logging.debug('Optimizer configuration: %s', optimizer_cfg)
     opt = build_optimizer(cfg=optimizer_cfg, model=model)
 
-    # Needs to be implemented under the factory design pattern
     logging.info('Creating data loaders.')
-    train_loader = DataLoader(
-        dataset=dataset_dict['dataset_train'], **data['train_loader']['loader_cfg'],
-        collate_fn=lambda x: tuple(zip(*x)))
-    val_loader = DataLoader(
-        dataset=dataset_dict['dataset_val'], **data['val_loader']['loader_cfg'],
-        collate_fn=lambda x: tuple(zip(*x)))
-    # ========================================================
+    train_loader = build_dataloader(cfg=data['train_loader'],
+                                    dataset=dataset_dict['dataset_train'],
+                                    collate_fn=collate_tuples)
+    val_loader = build_dataloader(cfg=data['val_loader'],
+                                  dataset=dataset_dict['dataset_val'],
+                                  collate_fn=collate_tuples)
 
     trainer_type = data['trainer']['type']
-    logging.debug(f'Trainer type: {trainer_type}')
+    logging.debug('Trainer type: %s', trainer_type)
     trainer_cfg = data['trainer']['trainer_cfg']
-    logging.debug(f'Trainer configuration: {trainer_cfg}')
+    logging.debug('Trainer configuration: %s', trainer_cfg)
     # criterion = LOSSES[data['trainer']['trainer_cfg']['criterion']]()
     criterion = None
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    logging.debug(f'Device: {device}')
+    logging.debug('Device: %s', device)
 
     tracker_cfg = data['trainer']['trainer_cfg']['tracker']
     tracker = TRACKERS[tracker_cfg](project_name='fashion-retrieval',
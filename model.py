@@ -7,8 +7,6 @@ from typing import Union, Tuple, Optional, Dict
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-import torchvision
-import torchvision.models as models
 
 import config
 
@@ -28,7 +26,8 @@ def resnet_18():
     """
     Returns a ResNet18 instance pretrained on ImageNet.
     """
-    return models.resnet18(weights=torchvision.models.ResNet18_Weights.IMAGENET1K_V1)
+    from torchvision.models import resnet18, ResNet18_Weights
+    return resnet18(weights=ResNet18_Weights.IMAGENET1K_V1)
 
 
 @BACKBONES.register('resnet_50')
@@ -36,7 +35,8 @@ def resnet_50():
     """
     Returns a ResNet50 instance pretrained on ImageNet.
     """
-    return models.resnet50(weights=torchvision.models.ResNet50_Weights.IMAGENET1K_V2)
+    from torchvision.models import resnet50, ResNet50_Weights
+    return resnet50(weights=ResNet50_Weights.IMAGENET1K_V2)
 
 
 @BACKBONES.register('resnet_152')
@@ -44,7 +44,8 @@ def resnet_152():
     """
     Returns a ResNet152 instance pretrained on ImageNet.
     """
-    return models.resnet152(weights=torchvision.models.ResNet152_Weights.IMAGENET1K_V2)
+    from torchvision.models import resnet152, ResNet152_Weights
+    return resnet152(weights=ResNet152_Weights.IMAGENET1K_V2)
 
 
 @BACKBONES.register('vit_b_16')
@@ -52,7 +53,42 @@ def vit_b_16():
     """
     Returns a vision transformer (ViT) instance pretrained on ImageNet.
     """
-    return models.vit_b_16(weights=torchvision.models.ViT_B_16_Weights.DEFAULT)
+    from torchvision.models import vit_b_16 as _vit_b_16, ViT_B_16_Weights
+    return _vit_b_16(weights=ViT_B_16_Weights.DEFAULT)
+
+
+def _init_conv(m: nn.Conv2d):
+    nn.init.kaiming_normal_(m.weight, mode='fan_out', nonlinearity='relu')
+    if m.bias is not None:
+        nn.init.constant_(m.bias, 0)
+
+
+def _init_norm(m: nn.modules.batchnorm._BatchNorm):
+    nn.init.constant_(m.weight, 1)
+    nn.init.constant_(m.bias, 0)
+
+
+def _init_linear(m: nn.Linear):
+    nn.init.normal_(m.weight, 0, 0.01)
+    if m.bias is not None:
+        nn.init.constant_(m.bias, 0)
+
+
+_INIT = {
+    nn.Conv2d: _init_conv,
+    nn.BatchNorm1d: _init_norm,
+    nn.BatchNorm2d: _init_norm,
+    nn.Linear: _init_linear,
+}
+
+
+def _init_weights(m: nn.Module):
+    """
+    Default weight initialisation shared by the classification heads, meant to be used with `nn.Module.apply`.
+    """
+    fn = _INIT.get(type(m))
+    if fn is not None:
+        fn(m)
 
 
 @CLS_HEADS.register('simple')
@@ -65,25 +101,12 @@ class ClassificationHead(nn.Module):
                                   out_features=kwargs['n_classes'])
 
     def forward(self, x: torch.Tensor):
-        if x.ndim > 2:
-            x = x.squeeze()
-        embedding = x
+        embedding = x.flatten(1)
         out_cls = self.cls_head(embedding)
         return out_cls, embedding
 
     def init_weights(self):
-        for m in self.modules():
-            if isinstance(m, nn.Conv2d):
-                nn.init.kaiming_normal_(
-                    m.weight, mode='fan_out', nonlinearity='relu')
-                if m.bias is not None:
-                    nn.init.constant_(m.bias, 0)
-            elif isinstance(m, nn.BatchNorm2d):
-                nn.init.constant_(m.weight, 1)
-                nn.init.constant_(m.bias, 0)
-            elif isinstance(m, nn.Linear):
-                nn.init.normal_(m.weight, 0, 0.01)
-                nn.init.constant_(m.bias, 0)
+        self.apply(_init_weights)
 
 
 @CLS_HEADS.register('linear')
@@ -110,23 +133,12 @@ class LinearClassificationHead(nn.Module):
                                   out_features=kwargs['n_classes'])
 
     def forward(self, x):
-        embedding = self.embedding(x.squeeze())
+        embedding = self.embedding(x.flatten(1))
         out_cls = self.cls_head(embedding)
         return out_cls, embedding
 
     def init_weights(self):
-        for m in self.modules():
-            if isinstance(m, nn.Conv2d):
-                nn.init.kaiming_normal_(
-                    m.weight, mode='fan_out', nonlinearity='relu')
-                if m.bias is not None:
-                    nn.init.constant_(m.bias, 0)
-            elif isinstance(m, nn.BatchNorm2d):
-                nn.init.constant_(m.weight, 1)
-                nn.init.constant_(m.bias, 0)
-            elif isinstance(m, nn.Linear):
-                nn.init.normal_(m.weight, 0, 0.01)
-                nn.init.constant_(m.bias, 0)
+        self.apply(_init_weights)
 
 
 @CLS_HEADS.register('cgd_head')
@@ -148,7 +160,7 @@ class CombinedGlobalDescriptorClassHead(nn.Module):
     Attributes:
         gd (CombinedGlobalDescriptor): A CombinedGlobalDescriptor module that computes
             one or more global descriptors from the input feature map.
-        bn (nn.BatchNorm2d): A BatchNorm2d layer that normalizes the output of the
+        bn (nn.BatchNorm1d): A BatchNorm1d layer that normalizes the output of the
             first global descriptor.
         cls (nn.Linear): A linear layer that computes the logits for classification.
 
@@ -167,24 +179,18 @@ class CombinedGlobalDescriptorClassHead(nn.Module):
         self.gd = DESCRIPTORS['config_descriptor'](fan_in=kwargs['fan_in'],
                                                    gd_config=kwargs['gd_config'],
                                                    feat_dim=kwargs['feat_dim'])
-        self.bn = nn.BatchNorm2d(num_features=kwargs['fan_in'])
+        self.bn = nn.BatchNorm1d(num_features=kwargs['fan_in'])
         self.cls = nn.Linear(
             in_features=kwargs['fan_in'], out_features=kwargs['n_classes'], bias=True)
 
     def forward(self, x: torch.Tensor):
         gd, first_gd = self.gd(x)
-        out = self.bn(first_gd)
+        out = self.bn(first_gd.flatten(1))
         out = self.cls(out)
         return out, gd
 
     def init_weights(self):
-        for m in self.modules():
-            if isinstance(m, nn.BatchNorm2d):
-                nn.init.constant_(m.weight, 1)
-                nn.init.constant_(m.bias, 0)
-            elif isinstance(m, nn.Linear):
-                nn.init.normal_(m.weight, 0, 0.01)
-                nn.init.constant_(m.bias, 0)
+        self.apply(_init_weights)
 
 
 class OBSModule(ABC, nn.Module):
@@ -246,6 +252,11 @@ class ResNetDeepFashion(OBSModule):
             The size of the output embeddings.
         """
         super(ResNetDeepFashion, self).__init__()
+        # The frozen backbone always sees the same input shape: let cuDNN autotune its
+        # convolutions once and allow TF32 matmuls/convolutions on Ampere and newer GPUs.
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
         self.cls_head_type = kwargs['cls_head_type']
         self.backbone = BACKBONES[kwargs['backbone']]()
         self.cls_head = None
@@ -257,11 +268,31 @@ class ResNetDeepFashion(OBSModule):
         """
         Prepare the ResNetDeepFashion model by modifying the final layer.
         """
-        num_features = list(self.backbone.children())[-1].in_features
-        self.backbone = nn.Sequential(*list(self.backbone.children())[:-1])
+        children = list(self.backbone.children())
+        num_features = children[-1].in_features
+        self.backbone = nn.Sequential(*children[:-1])
+        # NHWC lets cuDNN pick the tensor-core convolution kernels.
+        self.backbone = self.backbone.to(memory_format=torch.channels_last)
+        # The backbone is a frozen feature extractor: freeze it and keep it in eval mode so the
+        # compiled graph stays static.
+        self.freeze_weights()
+        self.backbone.eval()
+        if torch.cuda.is_available():
+            # Compiling in place keeps the module tree, and therefore the state_dict keys, unchanged.
+            # With dynamic=False and CUDA graphs, every new batch shape (the last partial batch of
+            # an epoch, a different validation batch size) triggers one extra compile and capture.
+            self.backbone.compile(mode='reduce-overhead', fullgraph=True, dynamic=False)
         self.cls_head_config['fan_in'] = num_features
         self.cls_head = CLS_HEADS[self.cls_head_type](**self.cls_head_config)
 
+    def train(self, mode: bool = True):
+        """
+        Sets the module in training mode, keeping the frozen `backbone` in evaluation mode.
+        """
+        super(ResNetDeepFashion, self).train(mode)
+        self.backbone.eval()
+        return self
+
     def freeze_weights(self):
         """
         Freezes the weights of the `backbone`'s layers.
@@ -321,11 +352,8 @@ class ResNetDeepFashion(OBSModule):
         if targets.ndim > 1:
             targets = targets.squeeze()
         logits, _, loss = self(x, targets)
-        logits_cpu = logits.to('cpu')
-        targets_cpu = targets.to('cpu')
-        predictions = torch.argmax(logits_cpu, dim=1)
-        train_accuracy = torch.sum(
-            predictions == targets_cpu) / len(targets_cpu)
+        # Keep the accuracy on the logits' device; only the final scalar is copied back.
+        train_accuracy = (logits.argmax(dim=1) == targets).float().mean()
 
         self.optimizer.zero_grad()
         loss.backward()
@@ -354,13 +382,9 @@ class ResNetDeepFashion(OBSModule):
         if targets_val.ndim > 1:
             targets_val = targets_val.squeeze()
         logits, _, val_loss = self(x_val, targets_val)
-        val_loss = val_loss.to('cpu').item()
-        logits_cpu = logits.to('cpu')
-        targets_cpu = targets_val.to('cpu')
-        predictions = torch.argmax(logits_cpu, dim=1)
-        val_accuracy = torch.sum(predictions == targets_cpu) / len(targets_cpu)
+        val_accuracy = (logits.argmax(dim=1) == targets_val).float().mean()
         return {'val_acc': val_accuracy.item(),
-                'val_loss': val_loss}
+                'val_loss': val_loss.item()}
 
     def forward(self, x: torch.Tensor,
                 targets: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor, Optional[torch.Tensor]]:
@@ -378,13 +402,14 @@ class ResNetDeepFashion(OBSModule):
             and the classification loss if targets is not None, otherwise only the embedings of the `cls_head`
             and the output tensor of the classification head. The loss is set to `None` in this case.
         """
-        with torch.no_grad():
-            out = self.backbone(x)
-        preds, embeddings = self.cls_head(out)
-        loss = None
-        if targets is not None:
-            loss = F.cross_entropy(preds, target=targets)
-            return preds, embeddings, loss
+        x = x.contiguous(memory_format=torch.channels_last)
+        with torch.autocast(device_type=x.device.type, dtype=torch.bfloat16, enabled=x.is_cuda):
+            with torch.inference_mode():
+                out = self.backbone(x)
+            # Inference tensors cannot be saved for backward, so hand the head a regular copy.
+            out = out.clone()
+            preds, embeddings = self.cls_head(out)
+            loss = F.cross_entropy(preds, target=targets) if targets is not None else None
         return preds, embeddings, loss
 
 
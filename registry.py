@@ -7,6 +7,8 @@ class Registry:
 
     Allows for fast instantiation of modules using string names provided in configuration files.
     """
+    __slots__ = ('registry',)
+
     def __init__(self):
         self.registry = {}
 
@@ -38,6 +40,18 @@ class Registry:
 
         return inner_wrapper
 
+    def __contains__(self, item: str) -> bool:
+        """
+        Check whether a class is registered under the specified name.
+
+        Args:
+            item (str): The name to look up.
+
+        Returns:
+            bool: `True` if the name is registered, `False` otherwise.
+        """
+        return item in self.registry
+
     def __getitem__(self, item: str) -> Union[Callable, nn.Module]:
         """
         Get the registered class with the specified name.
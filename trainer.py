@@ -18,6 +18,70 @@ from trackers import ExperimentTracker
 TRAINERS = Registry()
 
 
+def _apply_to_tensors(obj, fn):
+    """
+    Apply `fn` to every tensor found in a (possibly nested) batch of tuples, lists and dicts.
+    """
+    if isinstance(obj, torch.Tensor):
+        return fn(obj)
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_apply_to_tensors(o, fn) for o in obj)
+    if isinstance(obj, dict):
+        return {k: _apply_to_tensors(v, fn) for k, v in obj.items()}
+    return obj
+
+
+class CUDAPrefetcher:
+    """
+    Wraps a DataLoader and copies the next batch to the GPU on a side CUDA stream
+    while the current batch is being processed.
+
+    The host-to-device copies are only asynchronous if the DataLoader returns pinned
+    memory, i.e. it was created with `pin_memory=True`.
+
+    Args:
+        loader (DataLoader): The DataLoader to prefetch from.
+        device (str or torch.device): The CUDA device to copy the batches to.
+    """
+
+    def __init__(self, loader: data.DataLoader, device):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.stream = torch.cuda.Stream(device=self.device)
+        self._iter = None
+        self._next_batch = None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self._iter = iter(self.loader)
+        self._preload()
+        return self
+
+    def _preload(self):
+        try:
+            batch = next(self._iter)
+        except StopIteration:
+            self._next_batch = None
+            return
+        with torch.cuda.stream(self.stream):
+            self._next_batch = _apply_to_tensors(
+                batch, lambda t: t.to(self.device, non_blocking=True))
+
+    def __next__(self):
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(self.stream)
+        batch = self._next_batch
+        if batch is None:
+            raise StopIteration
+        # The tensors were allocated on the side stream; make sure the caching allocator
+        # does not hand their memory out again while the default stream still uses it.
+        _apply_to_tensors(batch, lambda t: t.record_stream(current_stream))
+        self._preload()
+        return batch
+
+
 @TRAINERS.register('simple-trainer')
 class Trainer:
     def __init__(self,
@@ -58,6 +122,14 @@ class Trainer:
         if callbacks is not None:
             self.callback_list = CallbackList(callbacks)
 
+    def _wrap_loader(self, loader: data.DataLoader):
+        """
+        Wrap `loader` in a `CUDAPrefetcher` when training on a CUDA device.
+        """
+        if torch.device(self.device).type == 'cuda':
+            return CUDAPrefetcher(loader, self.device)
+        return loader
+
     def train_epoch(self, epoch):
         """
         Train one epoch
@@ -70,7 +142,7 @@ class Trainer:
         train_correct = 0
         total = 0
 
-        for batch_idx, batch in enumerate(self.train_loader):
+        for batch_idx, batch in enumerate(self._wrap_loader(self.train_loader)):
             x, targets = batch
             res = self.model.training_step(x, targets, device=self.device,
                                            optimizer=self.optimizer,
@@ -92,7 +164,7 @@ class Trainer:
         Args:
             epoch (int): current epoch number
         """
-        for batch_idx, batch in enumerate(self.val_loader):
+        for batch_idx, batch in enumerate(self._wrap_loader(self.val_loader)):
             x, targets = batch
             res = self.model.validation_step(x, targets, device=self.device)
 